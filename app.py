@@ -1,10 +1,14 @@
 import os
 import json
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
-import google.generativeai as genai
 import re
+from profiling import profiled, span
+from model_client import MODEL_PREWARM, ModelClient
+import inventory
+import suggestion_cache
+import expiry_sweep
 
 # Load environment variables
 load_dotenv()
@@ -12,15 +16,9 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Configure the Gemini API
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY environment variable not set")
-
-genai.configure(api_key=GEMINI_API_KEY)
-
-# Use the Gemini 1.5 Flash model
-model = genai.GenerativeModel(
+# Use the Gemini 1.5 Flash model. The client is created on first use, so a missing
+# GEMINI_API_KEY is reported by the endpoints instead of failing at import
+model = ModelClient(
     model_name="gemini-1.5-flash",
     generation_config={
         "temperature": 0.7,
@@ -30,7 +28,18 @@ model = genai.GenerativeModel(
     }
 )
 
+# Warm the upstream connection in each serving process. Only processes that handle
+# requests start it, so a pre-forking master never opens a channel that workers inherit
+PREWARM_MODEL = MODEL_PREWARM and bool(os.getenv("GEMINI_API_KEY"))
+
+@app.before_request
+def warm_model_client():
+    """Start warming this worker's model connection on its first request"""
+    if PREWARM_MODEL:
+        model.start_background_warmup()
+
 @app.route('/api/test-connection', methods=['GET'])
+@profiled
 def test_connection():
     """Test if the Gemini API connection is working"""
     try:
@@ -47,7 +56,16 @@ def test_connection():
             "message": f"API connection error: {str(e)}"
         }), 500
 
+@app.route('/api/model-stats', methods=['GET'])
+def get_model_stats():
+    """Report model client initialization, warm-up and connection reuse statistics for this worker"""
+    return jsonify({
+        "status": "success",
+        "stats": model.get_stats()
+    })
+
 @app.route('/api/suggestions', methods=['POST'])
+@profiled
 def get_suggestions():
     """Get creative reuse ideas for leftover ingredients from Gemini AI"""
     try:
@@ -68,68 +86,72 @@ def get_suggestions():
                 "message": "Please enter food ingredients only. This AI is specialized in food waste reduction and cannot answer general questions."
             }), 400
         
-        # Construct the prompt
-        prompt = f"""You are a creative culinary AI assistant focused exclusively on reducing food waste.
-        
-        Given the following ingredients: {ingredients}
-        
-        Please suggest 3 creative ways to use these ingredients to prevent food waste.
-        
-        Format your response as a JSON array of objects, where each object has the following structure:
-        {{
-            "title": "Name of the dish or recipe idea",
-            "description": "A brief description of how to prepare it and why it's good for reducing waste"
-        }}
+        # Serve pre-generated suggestions for the same ingredient set if available
+        key = suggestion_cache.canonical_ingredients(ingredients)
+        suggestions = suggestion_cache.get(key)
+        if suggestions is None:
+            suggestions, raw_response = generate_suggestions(ingredients)
+            if raw_response is not None:
+                # If parsing fails, return the raw text
+                return jsonify({
+                    "status": "success",
+                    "raw_response": raw_response,
+                    "suggestions": []
+                })
+            if suggestions:
+                suggestion_cache.put(key, suggestions)
         
-        Each suggestion should be practical, use the ingredients provided, and focus on reducing food waste."""
+        return jsonify({
+            "status": "success",
+            "ingredients": ingredients,
+            "suggestions": suggestions
+        })
+    
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Error generating suggestions: {str(e)}"
+        }), 500
+
+@app.route('/api/households/<household>/suggestions', methods=['GET'])
+@profiled
+def get_household_suggestions(household):
+    """Get suggestions for a household's soon-to-expire items, pre-generated by the expiry sweep when possible"""
+    try:
+        try:
+            days = int(request.args.get('days', expiry_sweep.SWEEP_DAYS))
+        except ValueError:
+            days = -1
+        if days < 0 or days > expiry_sweep.MAX_DAYS:
+            return jsonify({
+                "status": "error",
+                "message": f"days must be a whole number from 0 to {expiry_sweep.MAX_DAYS}"
+            }), 400
         
-        # Send the request to Gemini
-        response = model.generate_content(prompt)
+        sets = expiry_sweep.expiring_sets(days, household)
         
-        # Try to parse the response as JSON
-        suggestions = []
-        try:
-            # Extract text content from response
-            response_text = response.text
-            
-            # Look for JSON content within response text
-            # Sometimes the model might include markdown code blocks or other text
-            json_start = response_text.find('[')
-            json_end = response_text.rfind(']') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                json_content = response_text[json_start:json_end]
-                suggestions = json.loads(json_content)
-            else:
-                # If no JSON array is found, try to extract structured data manually
-                lines = response_text.split('\n')
-                current_suggestion = None
-                
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    if current_suggestion is None:
-                        current_suggestion = {"title": line, "description": ""}
-                    elif "description" in current_suggestion and not current_suggestion["description"]:
-                        current_suggestion["description"] = line
-                        suggestions.append(current_suggestion)
-                        current_suggestion = None
-        except Exception as e:
-            print(f"Error parsing response: {e}")
-            print(f"Raw response: {response.text}")
-            # If parsing fails, return the raw text
+        if not sets or not sets[0][1]:
             return jsonify({
                 "status": "success",
-                "raw_response": response.text,
+                "household": household,
+                "ingredients": [],
                 "suggestions": []
             })
         
+        _, key, names = sets[0]
+        suggestions = suggestion_cache.get(key)
+        cached = suggestions is not None
+        if not cached:
+            suggestions, _ = generate_suggestions(", ".join(names))
+            if suggestions:
+                suggestion_cache.put(key, suggestions)
+        
         return jsonify({
             "status": "success",
-            "ingredients": ingredients,
-            "suggestions": suggestions
+            "household": household,
+            "ingredients": list(key),
+            "suggestions": suggestions,
+            "cached": cached
         })
     
     except Exception as e:
@@ -138,7 +160,66 @@ def get_suggestions():
             "message": f"Error generating suggestions: {str(e)}"
         }), 500
 
+def generate_suggestions(ingredients):
+    """Ask Gemini for reuse ideas; returns (suggestions, raw_response) where raw_response is set if parsing failed"""
+    # Construct the prompt
+    prompt = f"""You are a creative culinary AI assistant focused exclusively on reducing food waste.
+        
+        Given the following ingredients: {ingredients}
+        
+        Please suggest 3 creative ways to use these ingredients to prevent food waste.
+        
+        Format your response as a JSON array of objects, where each object has the following structure:
+        {{
+            "title": "Name of the dish or recipe idea",
+            "description": "A brief description of how to prepare it and why it's good for reducing waste"
+        }}
+        
+        Each suggestion should be practical, use the ingredients provided, and focus on reducing food waste."""
+    
+    # Send the request to Gemini
+    with span("generate_content"):
+        response = model.generate_content(prompt)
+    
+    # Try to parse the response as JSON
+    suggestions = []
+    try:
+        # Extract text content from response
+        response_text = response.text
+        
+        # Look for JSON content within response text
+        # Sometimes the model might include markdown code blocks or other text
+        json_start = response_text.find('[')
+        json_end = response_text.rfind(']') + 1
+        
+        if json_start >= 0 and json_end > json_start:
+            json_content = response_text[json_start:json_end]
+            suggestions = json.loads(json_content)
+        else:
+            # If no JSON array is found, try to extract structured data manually
+            lines = response_text.split('\n')
+            current_suggestion = None
+            
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                
+                if current_suggestion is None:
+                    current_suggestion = {"title": line, "description": ""}
+                elif "description" in current_suggestion and not current_suggestion["description"]:
+                    current_suggestion["description"] = line
+                    suggestions.append(current_suggestion)
+                    current_suggestion = None
+    except Exception as e:
+        print(f"Error parsing response: {e}")
+        print(f"Raw response: {response.text}")
+        return [], response.text
+    
+    return suggestions, None
+
 @app.route('/api/learn', methods=['POST'])
+@profiled
 def get_learn_content():
     """Get educational content about food waste topics from Gemini AI"""
     try:
@@ -160,7 +241,8 @@ def get_learn_content():
             }), 400
             
         # Construct the prompt
-        prompt = f"""Please provide educational content about "{topic}" in the context of food waste reduction, 
+        with span("build_prompt"):
+            prompt = f"""Please provide educational content about "{topic}" in the context of food waste reduction, 
         sustainable food practices, or environmentally friendly cooking methods.
         
         Format your response as a JSON object with the following structure:
@@ -176,54 +258,68 @@ def get_learn_content():
         Keep the entire response under 350 words and ensure the JSON is complete and properly closed."""
         
         # Send the request to Gemini
-        response = model.generate_content(prompt)
+        with span("generate_content"):
+            response = model.generate_content(prompt)
         
         # Try to parse the response as JSON
-        content = {}
-        try:
-            # Extract text content from response
-            response_text = response.text
-            
-            # Look for JSON content within response text
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                json_content = response_text[json_start:json_end]
+        with span("parse_response"):
+            content = {}
+            try:
+                # Extract text content from response
+                response_text = response.text
                 
-                # Try to parse the JSON
-                try:
-                    content = json.loads(json_content)
-                except json.JSONDecodeError:
-                    # If parsing fails, try to fix common JSON issues
-                    # 1. Fix truncated content by ensuring quotes match
-                    fixed_json = json_content
-                    quote_count = fixed_json.count('"')
-                    if quote_count % 2 != 0:  # Odd number of quotes (missing closing quote)
-                        last_quote_pos = fixed_json.rfind('"')
-                        if last_quote_pos != -1:
-                            # If there's an open array of tips or actionSteps, close it
-                            if "]" not in fixed_json[fixed_json.rfind("["):]:
-                                fixed_json = fixed_json[:last_quote_pos+1] + "]}"
-                            else:
-                                fixed_json = fixed_json[:last_quote_pos+1] + "}"
-                    
-                    # 2. Ensure array brackets match
-                    open_brackets = fixed_json.count("[")
-                    close_brackets = fixed_json.count("]")
-                    if open_brackets > close_brackets:
-                        fixed_json = fixed_json + "]" * (open_brackets - close_brackets)
+                # Look for JSON content within response text
+                json_start = response_text.find('{')
+                json_end = response_text.rfind('}') + 1
+                
+                if json_start >= 0 and json_end > json_start:
+                    json_content = response_text[json_start:json_end]
                     
-                    # Try to parse the fixed JSON
+                    # Try to parse the JSON
                     try:
-                        content = json.loads(fixed_json)
+                        content = json.loads(json_content)
                     except json.JSONDecodeError:
-                        # If still cannot parse, create a structured response manually
-                        raise
-            
-            # If JSON parsing fails, create a structured response
-            if not content:
-                # Create a simple structured response
+                        with span("repair_json"):
+                            # If parsing fails, try to fix common JSON issues
+                            # 1. Fix truncated content by ensuring quotes match
+                            fixed_json = json_content
+                            quote_count = fixed_json.count('"')
+                            if quote_count % 2 != 0:  # Odd number of quotes (missing closing quote)
+                                last_quote_pos = fixed_json.rfind('"')
+                                if last_quote_pos != -1:
+                                    # If there's an open array of tips or actionSteps, close it
+                                    if "]" not in fixed_json[fixed_json.rfind("["):]:
+                                        fixed_json = fixed_json[:last_quote_pos+1] + "]}"
+                                    else:
+                                        fixed_json = fixed_json[:last_quote_pos+1] + "}"
+                            
+                            # 2. Ensure array brackets match
+                            open_brackets = fixed_json.count("[")
+                            close_brackets = fixed_json.count("]")
+                            if open_brackets > close_brackets:
+                                fixed_json = fixed_json + "]" * (open_brackets - close_brackets)
+                            
+                            # Try to parse the fixed JSON
+                            try:
+                                content = json.loads(fixed_json)
+                            except json.JSONDecodeError:
+                                # If still cannot parse, create a structured response manually
+                                raise
+                
+                # If JSON parsing fails, create a structured response
+                if not content:
+                    # Create a simple structured response
+                    content = {
+                        "title": f"About {topic}",
+                        "introduction": "Here's some information on this topic.",
+                        "content": sanitize_content(response_text),
+                        "tips": ["Be mindful of food waste", "Plan your meals", "Store food properly"],
+                        "actionSteps": ["Implement one new practice", "Share knowledge with others", "Track your progress"]
+                    }
+            except Exception as e:
+                print(f"Error parsing response: {e}")
+                print(f"Raw response: {response.text}")
+                # Create a structured response
                 content = {
                     "title": f"About {topic}",
                     "introduction": "Here's some information on this topic.",
@@ -231,33 +327,105 @@ def get_learn_content():
                     "tips": ["Be mindful of food waste", "Plan your meals", "Store food properly"],
                     "actionSteps": ["Implement one new practice", "Share knowledge with others", "Track your progress"]
                 }
-        except Exception as e:
-            print(f"Error parsing response: {e}")
-            print(f"Raw response: {response.text}")
-            # Create a structured response
-            content = {
-                "title": f"About {topic}",
-                "introduction": "Here's some information on this topic.",
-                "content": sanitize_content(response_text),
-                "tips": ["Be mindful of food waste", "Plan your meals", "Store food properly"],
-                "actionSteps": ["Implement one new practice", "Share knowledge with others", "Track your progress"]
-            }
         
         # Ensure all required fields are present and properly formatted
-        content = validate_and_fix_content(content, topic)
+        with span("validate_and_fix_content"):
+            content = validate_and_fix_content(content, topic)
+        
+        with span("jsonify"):
+            return jsonify({
+                "status": "success",
+                "topic": topic,
+                "content": content
+            })
+    
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Error generating educational content: {str(e)}"
+        }), 500
+
+def get_bulk_format():
+    """Work out whether a bulk request uses CSV or NDJSON"""
+    data_format = request.args.get('format', '').lower()
+    if not data_format:
+        data_format = 'csv' if 'csv' in (request.content_type or '') else 'ndjson'
+    return data_format
+
+@app.route('/api/households/<household>/items/import', methods=['POST'])
+@profiled
+def import_items(household):
+    """Stream CSV or NDJSON rows from the request body into a household's inventory or used log"""
+    try:
+        data_format = get_bulk_format()
+        log = request.args.get('log', 'inventory')
+        
+        if data_format not in ('csv', 'ndjson'):
+            return jsonify({
+                "status": "error",
+                "message": "Unsupported format. Use csv or ndjson."
+            }), 400
+        
+        if log not in inventory.LOGS:
+            return jsonify({
+                "status": "error",
+                "message": "Unsupported log. Use inventory or used."
+            }), 400
+        
+        # Decode the body line by line so a bad byte only rejects its own row
+        lines = inventory.DecodedLines(request.stream)
+        if data_format == 'csv':
+            rows = inventory.iter_csv_rows(lines)
+        else:
+            rows = inventory.iter_ndjson_rows(lines)
+        
+        summary = inventory.import_items(household, rows, log)
+        
+        # Rows before the failure are already committed, so report them alongside the error
+        if "failed" in summary:
+            failed = summary["failed"]
+            return jsonify({
+                "status": "error",
+                "message": f"Import stopped at line {failed['line']}: {failed['error']}",
+                "household": household,
+                **summary
+            }), 400 if failed["reason"] == "input" else 500
         
         return jsonify({
             "status": "success",
-            "topic": topic,
-            "content": content
+            "household": household,
+            **summary
         })
     
     except Exception as e:
         return jsonify({
             "status": "error",
-            "message": f"Error generating educational content: {str(e)}"
+            "message": f"Error importing items: {str(e)}"
         }), 500
 
+@app.route('/api/households/<household>/items/export', methods=['GET'])
+@profiled
+def export_items(household):
+    """Stream a household's inventory or used log as CSV or NDJSON"""
+    data_format = request.args.get('format', 'ndjson').lower()
+    log = request.args.get('log', 'inventory')
+    
+    if data_format not in ('csv', 'ndjson') or log not in inventory.LOGS:
+        return jsonify({
+            "status": "error",
+            "message": "Unsupported format or log. Use format=csv|ndjson and log=inventory|used."
+        }), 400
+    
+    items = inventory.iter_items(household, log)
+    if data_format == 'csv':
+        body, mimetype = inventory.export_csv(items), 'text/csv'
+    else:
+        body, mimetype = inventory.export_ndjson(items), 'application/x-ndjson'
+    
+    return Response(body, mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{log}.{data_format}"'
+    })
+
 # Helper functions for validating queries
 def is_food_related_query(query):
     """Check if the query is related to food ingredients"""
@@ -393,4 +561,13 @@ def validate_and_fix_content(content, topic):
     return content
 
 if __name__ == '__main__':
+    # Pre-generate suggestions for soon-to-expire items in the background. Only the
+    # reloader's serving child starts the sweep, so there is exactly one per server
+    if expiry_sweep.SWEEP_ENABLED and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        expiry_sweep.start(lambda ingredients: generate_suggestions(ingredients)[0])
+    
+    # The reloader's serving child handles requests itself, so warm it before the first request
+    if PREWARM_MODEL and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        model.start_background_warmup()
+    
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+Record/replay cassettes for Gemini traffic.
+
+In record mode every `generate_content` call is forwarded to the real model and
+the prompt, response text and upstream latency are appended to a cassette file.
+In replay mode responses are served from the cassette without any network
+access, sleeping for the recorded latency multiplied by a scale factor.
+
+Cassettes are newline-delimited JSON, gzip-compressed when the path ends in
+`.gz`. Each line holds one interaction:
+
+    {"key": "<sha256 of prompt>", "prompt": "...", "text": "...", "latency": 1.234}
+
+Configuration via environment variables, read each time a model is wrapped:
+
+- TRANA_CASSETTE_MODE: "record", "replay" or empty (disabled)
+- TRANA_CASSETTE_PATH: cassette file (default cassettes/gemini.ndjson.gz)
+- TRANA_CASSETTE_LATENCY_SCALE: multiplier for replayed latency (default 1.0,
+  0 replays instantly)
+"""
+
+import os
+import json
+import gzip
+import time
+import hashlib
+import threading
+from collections import defaultdict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_CASSETTE_PATH = os.path.join("cassettes", "gemini.ndjson.gz")
+
+
+def cassette_mode():
+    """Return the configured cassette mode: "record", "replay" or "" when disabled"""
+    return os.getenv("TRANA_CASSETTE_MODE", "")
+
+
+class CassetteMissError(Exception):
+    """Raised in replay mode when a prompt has no recorded response"""
+
+
+class CassetteResponse:
+    """Minimal stand-in for a Gemini response; only `text` is used by the app"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def prompt_key(prompt):
+    """Return the cassette key for a prompt"""
+    return hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def load_cassette(path):
+    """Read all interactions from a cassette file"""
+    interactions = []
+    with _open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                interactions.append(json.loads(line))
+    return interactions
+
+
+class RecordingModel:
+    """Forwards calls to a real model and appends each interaction to a cassette"""
+
+    def __init__(self, model, path):
+        self.model = model
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def generate_content(self, prompt, **kwargs):
+        start = time.perf_counter()
+        response = self.model.generate_content(prompt, **kwargs)
+        latency = time.perf_counter() - start
+        # Reading .text may raise for blocked responses; those are not recorded
+        text = response.text
+
+        entry = {
+            "key": prompt_key(prompt),
+            "prompt": str(prompt),
+            "text": text,
+            "latency": round(latency, 4),
+        }
+        with self._lock:
+            # gzip members can be concatenated, so appending keeps the file valid
+            with _open(self.path, "a") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return response
+
+
+class ReplayModel:
+    """Serves responses recorded in a cassette, with optional simulated latency"""
+
+    def __init__(self, path, latency_scale=1.0):
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._interactions = defaultdict(list)
+        self._positions = defaultdict(int)
+        for entry in load_cassette(path):
+            self._interactions[entry["key"]].append(entry)
+
+    def generate_content(self, prompt, **kwargs):
+        key = prompt_key(prompt)
+        recorded = self._interactions.get(key)
+        if not recorded:
+            raise CassetteMissError(f"No recorded response for prompt {key[:12]}")
+
+        # Repeated prompts replay their recordings in order, then cycle
+        with self._lock:
+            entry = recorded[self._positions[key] % len(recorded)]
+            self._positions[key] += 1
+
+        if self.latency_scale > 0:
+            time.sleep(entry["latency"] * self.latency_scale)
+        return CassetteResponse(entry["text"])
+
+
+def use_cassette(model, mode=None, path=None, latency_scale=None):
+    """Wrap a model according to the cassette mode; returns the model unchanged when disabled"""
+    if mode is None:
+        mode = cassette_mode()
+    if path is None:
+        path = os.getenv("TRANA_CASSETTE_PATH", DEFAULT_CASSETTE_PATH)
+    if latency_scale is None:
+        latency_scale = float(os.getenv("TRANA_CASSETTE_LATENCY_SCALE", "1.0"))
+
+    if mode == "record":
+        return RecordingModel(model, path)
+    if mode == "replay":
+        return ReplayModel(path, latency_scale)
+    if mode:
+        raise ValueError(f"Unknown cassette mode: {mode}")
+    return model
@@ -0,0 +1,124 @@
+"""
+Background sweep that pre-generates suggestions for soon-to-expire items.
+
+Every TRANA_SWEEP_INTERVAL seconds the sweep collects unused items expiring
+within TRANA_SWEEP_DAYS days from the inventory store into a priority queue
+ordered by expiry date. Households are visited most-urgent first; each
+household's expiring items become one canonical ingredient set, and
+suggestions for sets not already cached are generated and cached.
+
+Generation is rate-limited: at most TRANA_SWEEP_BUDGET model calls per sweep,
+spaced at least TRANA_SWEEP_MIN_GAP seconds apart, so the sweep never competes
+with interactive traffic for quota. The budget applies to the process running
+the sweep, so run exactly one: either `python expiry_sweep.py` alongside the
+web workers, or TRANA_EXPIRY_SWEEP=1 with the single-process development
+server (`python app.py`). The suggestion cache is shared through SQLite, so
+suggestions generated by the sweep are served by every worker.
+"""
+
+import os
+import time
+import heapq
+import threading
+
+from dotenv import load_dotenv
+
+import inventory
+import suggestion_cache
+
+load_dotenv()
+
+SWEEP_ENABLED = os.getenv("TRANA_EXPIRY_SWEEP", "") == "1"
+SWEEP_INTERVAL = float(os.getenv("TRANA_SWEEP_INTERVAL", "3600"))
+SWEEP_DAYS = int(os.getenv("TRANA_SWEEP_DAYS", "3"))  # Matches EXPIRY_WARNING_DAYS in the food logger
+SWEEP_BUDGET = int(os.getenv("TRANA_SWEEP_BUDGET", "20"))
+SWEEP_MIN_GAP = float(os.getenv("TRANA_SWEEP_MIN_GAP", "2.0"))
+MAX_DAYS = 365  # Upper bound for the days parameter of the household suggestions endpoint
+MAX_INGREDIENTS_PER_SET = 8
+
+_stop = threading.Event()
+_thread = None
+
+
+def expiring_sets(within_days=SWEEP_DAYS, household=None):
+    """Return [(household, canonical key, item names)] ordered by each household's earliest expiry"""
+    queue = []
+    for item_household, name, expiry_date in inventory.iter_expiring_items(within_days, household):
+        heapq.heappush(queue, (expiry_date, item_household, name))
+
+    # Popping in expiry order means households appear in order of their most urgent item,
+    # and each household's list keeps its soonest-expiring ingredients first
+    households = {}
+    while queue:
+        _, item_household, name = heapq.heappop(queue)
+        names = households.setdefault(item_household, [])
+        if len(names) < MAX_INGREDIENTS_PER_SET and name not in names:
+            names.append(name)
+
+    return [(item_household, suggestion_cache.canonical_ingredients(names), names)
+            for item_household, names in households.items()]
+
+
+def run_sweep(generate, within_days=SWEEP_DAYS, budget=SWEEP_BUDGET, min_gap=SWEEP_MIN_GAP):
+    """Pre-generate suggestions for expiring sets; returns the number of model calls made
+
+    `generate` takes a comma-separated ingredient string and returns a list of suggestions.
+    """
+    calls = 0
+    last_call = None
+
+    for household, key, names in expiring_sets(within_days):
+        if calls >= budget or _stop.is_set():
+            break
+        if not key or suggestion_cache.contains(key):
+            continue
+
+        if last_call is not None:
+            wait = min_gap - (time.monotonic() - last_call)
+            if wait > 0 and _stop.wait(wait):
+                break
+        last_call = time.monotonic()
+        calls += 1
+
+        try:
+            suggestions = generate(", ".join(names))
+        except Exception as e:
+            print(f"Error pre-generating suggestions for {household}: {e}")
+            continue
+        if suggestions:
+            suggestion_cache.put(key, suggestions)
+
+    return calls
+
+
+def _sweep_loop(generate):
+    while not _stop.is_set():
+        try:
+            calls = run_sweep(generate)
+            print(f"Expiry sweep finished: {calls} suggestion sets generated")
+        except Exception as e:
+            print(f"Error running expiry sweep: {e}")
+        _stop.wait(SWEEP_INTERVAL)
+
+
+def start(generate):
+    """Start the sweep in a daemon thread; does nothing if already running"""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return _thread
+    _stop.clear()
+    _thread = threading.Thread(target=_sweep_loop, args=(generate,), daemon=True, name="expiry-sweep")
+    _thread.start()
+    return _thread
+
+
+def stop():
+    """Signal the sweep thread to exit"""
+    _stop.set()
+
+
+if __name__ == "__main__":
+    # Run the sweep as its own process, next to any number of web workers
+    from app import generate_suggestions
+
+    _sweep_loop(lambda ingredients: generate_suggestions(ingredients)[0])
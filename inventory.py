@@ -0,0 +1,367 @@
+"""
+Server-side storage for food inventories and used-item logs.
+
+Items are stored in SQLite, keyed by household, with the same fields the food
+logger keeps in localStorage (see js/food-logger.js). Import and export work
+on iterators so arbitrarily large CSV or NDJSON files are handled in constant
+memory: rows are validated one at a time and written in chunked transactions.
+"""
+
+import os
+import csv
+import json
+import math
+import uuid
+import sqlite3
+from datetime import date, datetime, timedelta
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_PATH = os.getenv("TRANA_DB_PATH", "trana.db")
+IMPORT_CHUNK_SIZE = int(os.getenv("TRANA_IMPORT_CHUNK_SIZE", "500"))
+EXPORT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+# Field names match the objects built by handleFormSubmit/markItemAsUsed
+ITEM_FIELDS = [
+    "id", "name", "category", "quantity", "unit", "storageLocation",
+    "dateAdded", "expiryDate", "notes", "addedTimestamp", "usedTimestamp",
+]
+
+_COLUMNS = {
+    "id": "id",
+    "name": "name",
+    "category": "category",
+    "quantity": "quantity",
+    "unit": "unit",
+    "storageLocation": "storage_location",
+    "dateAdded": "date_added",
+    "expiryDate": "expiry_date",
+    "notes": "notes",
+    "addedTimestamp": "added_timestamp",
+    "usedTimestamp": "used_timestamp",
+}
+
+LOGS = ("inventory", "used")
+
+
+class ItemValidationError(ValueError):
+    """Raised when an imported row cannot be turned into a food item"""
+
+
+# Database paths whose schema this process has already set up
+_ready_paths = set()
+
+
+def get_connection():
+    """Open a connection to the inventory database, creating tables on first use"""
+    conn = sqlite3.connect(DB_PATH)
+    if DB_PATH not in _ready_paths:
+        try:
+            _create_schema(conn)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        _ready_paths.add(DB_PATH)
+    return conn
+
+
+def _create_schema(conn):
+    # WAL mode is stored in the database file, so it only needs setting once
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS food_items (
+            household TEXT NOT NULL,
+            id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            quantity REAL,
+            unit TEXT,
+            storage_location TEXT,
+            date_added TEXT,
+            expiry_date TEXT NOT NULL,
+            notes TEXT,
+            added_timestamp TEXT,
+            used_timestamp TEXT,
+            PRIMARY KEY (household, id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_food_items_expiry ON food_items (expiry_date)")
+
+
+def _parse_date(value, field):
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ItemValidationError(f"{field} must be a date in YYYY-MM-DD format")
+
+
+def validate_item(row, log="inventory"):
+    """Normalize a raw CSV/NDJSON row into a food item dict, or raise ItemValidationError"""
+    if not isinstance(row, dict):
+        raise ItemValidationError("Row must be an object")
+
+    # CSV gives empty strings for missing cells; treat them like missing keys
+    row = {key: value.strip() if isinstance(value, str) else value
+           for key, value in row.items() if key in _COLUMNS and value not in ("", None)}
+
+    name = str(row.get("name", "")).strip()
+    if not name:
+        raise ItemValidationError("name is required")
+
+    if "expiryDate" not in row:
+        raise ItemValidationError("expiryDate is required")
+
+    quantity = row.get("quantity", 1)
+    try:
+        quantity = float(quantity)
+    except (TypeError, ValueError):
+        raise ItemValidationError("quantity must be a number")
+    if not math.isfinite(quantity):
+        raise ItemValidationError("quantity must be a finite number")
+    if quantity < 0:
+        raise ItemValidationError("quantity cannot be negative")
+    if quantity.is_integer():
+        # Keep whole quantities as integers so "2" round-trips as 2, not 2.0
+        quantity = int(quantity)
+
+    now = datetime.now().isoformat()
+    item = {
+        "id": str(row.get("id") or uuid.uuid4().hex),
+        "name": name,
+        "category": str(row.get("category", "other")),
+        "quantity": quantity,
+        "unit": str(row.get("unit", "item")),
+        "storageLocation": str(row.get("storageLocation", "")),
+        "dateAdded": _parse_date(str(row.get("dateAdded", date.today().isoformat())), "dateAdded"),
+        "expiryDate": _parse_date(str(row["expiryDate"]), "expiryDate"),
+        "notes": str(row.get("notes", "")),
+        "addedTimestamp": str(row.get("addedTimestamp", now)),
+        "usedTimestamp": None,
+    }
+    if log == "used":
+        item["usedTimestamp"] = str(row.get("usedTimestamp", now))
+    return item
+
+
+class DecodedLines:
+    """Iterate over a binary stream as UTF-8 text lines
+
+    Each line is decoded on its own, so a line with invalid bytes raises
+    ItemValidationError for that line only and iteration can carry on with the
+    next one. A leading byte order mark, as added by spreadsheet exports, is dropped.
+    """
+
+    def __init__(self, stream):
+        self._lines = iter(stream)
+        self._first = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        raw = next(self._lines)
+        encoding = "utf-8-sig" if self._first else "utf-8"
+        self._first = False
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError as e:
+            raise ItemValidationError(f"Invalid UTF-8 at byte {e.start}")
+
+
+def iter_csv_rows(lines):
+    """Yield (line number, row) pairs from an iterable of CSV text lines
+
+    Malformed rows (e.g. a field over the csv module's size limit, or a line that
+    is not valid UTF-8) are yielded as ItemValidationError so they are reported per
+    row; the reader carries on after them.
+    """
+    reader = csv.DictReader(lines)
+    # Lines that failed to decode never reach the csv reader, so its line_num
+    # falls behind the physical line number by one for each of them
+    skipped = 0
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield reader.line_num + skipped + 1, ItemValidationError(f"Invalid CSV: {e}")
+            continue
+        except ItemValidationError as e:
+            skipped += 1
+            yield reader.line_num + skipped, e
+            continue
+        yield reader.line_num + skipped, row
+
+
+def iter_ndjson_rows(lines):
+    """Yield (line number, row) pairs from an iterable of NDJSON text lines"""
+    lines = iter(lines)
+    line_num = 0
+    while True:
+        line_num += 1
+        try:
+            line = next(lines)
+        except StopIteration:
+            return
+        except ItemValidationError as e:
+            yield line_num, e
+            continue
+
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_num, ItemValidationError(f"Invalid JSON: {e.msg}")
+
+
+def import_items(household, rows, log="inventory"):
+    """Validate and insert (line number, row) pairs in chunked transactions
+
+    Returns a summary with the number of committed rows and per-row errors. If the
+    input itself becomes unreadable (e.g. invalid UTF-8) or a write fails, the
+    import stops: rows already committed stay, and "failed" describes where and why.
+    """
+    insert_sql = (
+        f"INSERT OR REPLACE INTO food_items (household, {', '.join(_COLUMNS.values())}) "
+        f"VALUES ({', '.join('?' * (len(_COLUMNS) + 1))})"
+    )
+    imported = 0
+    error_count = 0
+    errors = []
+    failed = None
+    chunk = []
+    last_line = 0
+
+    conn = get_connection()
+    try:
+        def flush():
+            with conn:
+                conn.executemany(insert_sql, chunk)
+            chunk.clear()
+
+        rows = iter(rows)
+        while True:
+            try:
+                line_num, row = next(rows)
+            except StopIteration:
+                break
+            except (UnicodeDecodeError, csv.Error, OSError) as e:
+                failed = {"line": last_line + 1, "reason": "input", "error": f"Could not read input: {e}"}
+                break
+            last_line = line_num
+
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                item = validate_item(row, log)
+            except ItemValidationError as e:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": line_num, "error": str(e)})
+                continue
+
+            chunk.append([household] + [item[field] for field in _COLUMNS])
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                pending = len(chunk)
+                flush()
+                imported += pending
+
+        if chunk:
+            pending = len(chunk)
+            flush()
+            imported += pending
+    except sqlite3.Error as e:
+        failed = {"line": last_line, "reason": "storage", "error": f"Could not save rows: {e}"}
+    finally:
+        conn.close()
+
+    summary = {"imported": imported, "errorCount": error_count, "errors": errors}
+    if failed is not None:
+        summary["failed"] = failed
+    return summary
+
+
+def iter_items(household, log="inventory"):
+    """Yield stored items for a household in expiry order, fetching in chunks"""
+    used_filter = "IS NOT NULL" if log == "used" else "IS NULL"
+    conn = get_connection()
+    try:
+        cursor = conn.execute(
+            f"SELECT {', '.join(_COLUMNS.values())} FROM food_items "
+            f"WHERE household = ? AND used_timestamp {used_filter} ORDER BY expiry_date",
+            (household,)
+        )
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                item = dict(zip(_COLUMNS, row))
+                # REAL columns hand back whole quantities as floats
+                if isinstance(item["quantity"], float) and item["quantity"].is_integer():
+                    item["quantity"] = int(item["quantity"])
+                yield item
+    finally:
+        conn.close()
+
+
+def iter_expiring_items(within_days, household=None):
+    """Yield (household, name, expiryDate) for unused items expiring in the next `within_days` days"""
+    today = date.today()
+    params = [today.isoformat(), (today + timedelta(days=within_days)).isoformat()]
+    household_filter = ""
+    if household is not None:
+        household_filter = "AND household = ?"
+        params.append(household)
+
+    conn = get_connection()
+    try:
+        cursor = conn.execute(
+            "SELECT household, name, expiry_date FROM food_items "
+            f"WHERE used_timestamp IS NULL AND expiry_date BETWEEN ? AND ? {household_filter}",
+            params
+        )
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+class _LineBuffer:
+    """File-like target for csv.writer that hands back what was written"""
+
+    def __init__(self):
+        self.value = ""
+
+    def write(self, text):
+        self.value += text
+
+    def pop(self):
+        value, self.value = self.value, ""
+        return value
+
+
+def export_csv(items):
+    """Yield CSV text, one line at a time, for an iterable of items"""
+    buffer = _LineBuffer()
+    writer = csv.DictWriter(buffer, fieldnames=ITEM_FIELDS)
+    writer.writeheader()
+    yield buffer.pop()
+    for item in items:
+        writer.writerow(item)
+        yield buffer.pop()
+
+
+def export_ndjson(items):
+    """Yield NDJSON lines for an iterable of items"""
+    for item in items:
+        yield json.dumps(item, ensure_ascii=False) + "\n"
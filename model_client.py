@@ -0,0 +1,225 @@
+"""
+Lazily initialized, reusable Gemini model client.
+
+The client is configured on first use rather than at import, so processes that
+never call the model (tests, static-only workers) do not need an API key and
+configuration mistakes surface as request errors instead of import failures.
+
+Each worker process keeps one model instance, and with it one persistent gRPC
+channel to the Gemini API (HTTP/2, reused across requests). The channel can be
+pre-established in the background with a cheap count_tokens call, and an idle
+keep-alive call stops it from going cold between requests.
+
+gRPC channels cannot be shared across fork, so warm-up is started lazily by
+each serving process (`start_background_warmup`, called on every request and
+effective once per pid). A process that only forks workers, or a short-lived
+child forked from a worker, never handles a request and so never opens a channel.
+"""
+
+import os
+import time
+import threading
+
+from dotenv import load_dotenv
+
+from cassette import cassette_mode, use_cassette
+
+load_dotenv()
+
+MODEL_PREWARM = os.getenv("TRANA_MODEL_PREWARM", "1") == "1"
+try:
+    MODEL_KEEPALIVE = float(os.getenv("TRANA_MODEL_KEEPALIVE", "240"))  # Idle seconds between keep-alive calls; 0 disables
+except ValueError:
+    # A bad value must not make importing the app fail, which this module exists to avoid
+    print(f"Ignoring invalid TRANA_MODEL_KEEPALIVE={os.getenv('TRANA_MODEL_KEEPALIVE')!r}, using 240")
+    MODEL_KEEPALIVE = 240.0
+WARMUP_PROMPT = "ping"
+
+
+def _fresh_stats():
+    return {
+        "initializations": 0,
+        "init_seconds": None,
+        "connections_opened": 0,
+        "requests": 0,
+        "requests_on_reused_connection": 0,
+        "warmups": 0,
+        "keepalives": 0,
+        "first_request_seconds": None,
+        "last_error": None,
+    }
+
+
+class ModelClient:
+    """Drop-in stand-in for GenerativeModel that builds the real client on first use"""
+
+    def __init__(self, model_name, generation_config):
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._model = None
+        self._pid = None
+        self._last_used = 0.0
+        self._connection_used = False
+        self._warmup_pid = None
+        self._warmup_thread = None
+        self.stats = _fresh_stats()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A parent thread may have held a lock at fork time and threads do not survive,
+        # so the child starts with fresh ones; its warm-up starts on its first request
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._warmup_thread = None
+        # Counters inherited from the parent describe another process
+        self.stats = _fresh_stats()
+
+    def _build(self):
+        # Replaying a cassette needs no API key, so the backend can run offline
+        if cassette_mode() == "replay":
+            return use_cassette(None)
+
+        api_key = os.getenv("GEMINI_API_KEY", "")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY environment variable not set")
+
+        # Imported here so processes that never call the model skip loading the SDK
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key, transport="grpc")
+        return use_cassette(genai.GenerativeModel(
+            model_name=self.model_name,
+            generation_config=self.generation_config
+        ))
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _set(self, **values):
+        with self._stats_lock:
+            self.stats.update(values)
+
+    def _initialized(self):
+        return self._model is not None and self._pid == os.getpid()
+
+    def get_model(self):
+        """Return the model for this process, initializing it on first use"""
+        pid = os.getpid()
+        if self._model is not None and self._pid == pid:
+            return self._model
+
+        with self._lock:
+            if self._model is None or self._pid != pid:
+                if self._pid is not None and self._pid != pid:
+                    # Forked child: counters inherited from the parent describe another process
+                    with self._stats_lock:
+                        self.stats = _fresh_stats()
+                # A new model means a new channel, opened by its first upstream call
+                self._connection_used = False
+                start = time.perf_counter()
+                try:
+                    self._model = self._build()
+                except Exception as e:
+                    self._set(last_error=str(e))
+                    raise
+                self._pid = pid
+                self._count("initializations")
+                self._set(init_seconds=round(time.perf_counter() - start, 4))
+            return self._model
+
+    def _use_connection(self):
+        """Record a call on this worker's channel; returns True if the channel was already open"""
+        with self._stats_lock:
+            reused = self._connection_used
+            if not reused:
+                self._connection_used = True
+                self.stats["connections_opened"] += 1
+            return reused
+
+    def generate_content(self, prompt, **kwargs):
+        # Timed from before initialization, so a cold first request includes init cost
+        start = time.perf_counter()
+        try:
+            model = self.get_model()
+            reused = self._use_connection()
+            response = model.generate_content(prompt, **kwargs)
+        except Exception as e:
+            self._set(last_error=str(e))
+            raise
+        finally:
+            self._last_used = time.monotonic()
+        elapsed = round(time.perf_counter() - start, 4)
+
+        with self._stats_lock:
+            if self.stats["requests"] == 0:
+                self.stats["first_request_seconds"] = elapsed
+            self.stats["requests"] += 1
+            if reused:
+                self.stats["requests_on_reused_connection"] += 1
+        return response
+
+    def warm_up(self):
+        """Initialize the client and open its upstream channel"""
+        model = self.get_model()
+        # count_tokens goes over the same channel as generate_content but is not billed
+        if hasattr(model, "count_tokens"):
+            self._use_connection()
+            model.count_tokens(WARMUP_PROMPT)
+        self._last_used = time.monotonic()
+        self._count("warmups")
+
+    def _keepalive_loop(self):
+        while True:
+            idle = time.monotonic() - self._last_used
+            if idle < MODEL_KEEPALIVE:
+                time.sleep(MODEL_KEEPALIVE - idle)
+                continue
+            try:
+                model = self.get_model()
+                self._use_connection()
+                model.count_tokens(WARMUP_PROMPT)
+                self._count("keepalives")
+            except Exception as e:
+                self._set(last_error=str(e))
+            self._last_used = time.monotonic()
+
+    def start_background_warmup(self):
+        """Pre-establish the upstream connection and keep it warm from a daemon thread
+
+        Starts at most once per process and is cheap afterwards, so it can be called
+        at the start of every request. Call it only from a process that serves requests.
+        """
+        pid = os.getpid()
+        if self._warmup_pid == pid:
+            return
+
+        def run():
+            try:
+                self.warm_up()
+            except Exception as e:
+                self._set(last_error=str(e))
+                print(f"Error warming up model client: {e}")
+                return
+            if MODEL_KEEPALIVE > 0 and hasattr(self._model, "count_tokens"):
+                self._keepalive_loop()
+
+        with self._lock:
+            if self._warmup_pid == pid:
+                return
+            self._warmup_pid = pid
+            self._warmup_thread = threading.Thread(target=run, daemon=True, name="model-warmup")
+            self._warmup_thread.start()
+
+    def get_stats(self):
+        """Return initialization, connection reuse, warm-up and request statistics for this worker"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["connection_reuse_ratio"] = (
+            round(stats["requests_on_reused_connection"] / stats["requests"], 4) if stats["requests"] else None
+        )
+        stats["initialized"] = self._initialized()
+        stats["pid"] = os.getpid()
+        return stats
@@ -0,0 +1,253 @@
+"""
+Opt-in request profiling for the Trāṇa Flask backend.
+
+Profiling is enabled either for every request with TRANA_PROFILE=1, or per
+request with an X-Trana-Profile header signed with TRANA_PROFILE_SECRET.
+Signed headers carry an expiry time, may not be valid for more than
+TRANA_PROFILE_MAX_TTL seconds, and can be used only once.
+TRANA_PROFILE_SAMPLE_RATE (0.0 - 1.0) controls how many eligible requests are
+actually profiled.
+
+Each profiled request records named spans and, if TRANA_PROFILE_STACKS=1,
+periodically sampled stacks. Results are written to TRANA_PROFILE_DIR as
+collapsed-stack (.folded) files, which can be loaded by flamegraph.pl,
+speedscope or inferno. Only the newest TRANA_PROFILE_MAX_FILES files are kept.
+
+When neither the env var nor the secret is set, `profiled` returns the handler
+unchanged and `span` returns a shared no-op context, so there is no overhead.
+"""
+
+import os
+import sys
+import hmac
+import time
+import random
+import secrets
+import hashlib
+import threading
+import functools
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+from flask import request
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_number(name, default, cast=float):
+    """Read a numeric setting, falling back to the default when the value is not a number
+
+    Profiling must never stop the app from starting, so a bad value is reported
+    instead of raising at import.
+    """
+    value = os.getenv(name, "")
+    if not value:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        print(f"Ignoring invalid {name}={value!r}, using {default}")
+        return default
+
+
+PROFILE_ENABLED = os.getenv("TRANA_PROFILE", "") == "1"
+PROFILE_SECRET = os.getenv("TRANA_PROFILE_SECRET", "")
+PROFILE_SAMPLE_RATE = _env_number("TRANA_PROFILE_SAMPLE_RATE", 1.0)
+PROFILE_STACKS = os.getenv("TRANA_PROFILE_STACKS", "") == "1"
+PROFILE_STACK_INTERVAL = _env_number("TRANA_PROFILE_STACK_INTERVAL", 0.005)
+PROFILE_DIR = os.getenv("TRANA_PROFILE_DIR", "profiles")
+PROFILE_MAX_TTL = _env_number("TRANA_PROFILE_MAX_TTL", 300, int)
+PROFILE_MAX_FILES = _env_number("TRANA_PROFILE_MAX_FILES", 200, int)
+PROFILE_HEADER = "X-Trana-Profile"
+
+_NULL_SPAN = nullcontext()
+_local = threading.local()
+
+# Nonces already accepted, mapped to their expiry, so each header works once
+_used_nonces = {}
+_used_lock = threading.Lock()
+_dump_lock = threading.Lock()
+
+
+def profiling_available():
+    """Check whether any profiling mode is configured for this process"""
+    return PROFILE_ENABLED or bool(PROFILE_SECRET)
+
+
+def _signature(path, expires, nonce):
+    payload = f"{path}:{expires}:{nonce}".encode()
+    return hmac.new(PROFILE_SECRET.encode(), payload, hashlib.sha256).hexdigest()
+
+
+def sign_path(path, ttl=60):
+    """Return a single-use header value that enables profiling for a request path for `ttl` seconds"""
+    expires = int(time.time()) + ttl
+    nonce = secrets.token_hex(8)
+    return f"{expires}:{nonce}:{_signature(path, expires, nonce)}"
+
+
+def verify_signature(header, path):
+    """Check a signed header is genuine, unexpired, within the TTL limit and not reused"""
+    parts = header.split(":")
+    if len(parts) != 3:
+        return False
+    expires, nonce, signature = parts
+    try:
+        expires = int(expires)
+    except ValueError:
+        return False
+
+    now = int(time.time())
+    if expires < now or expires > now + PROFILE_MAX_TTL:
+        return False
+    if not hmac.compare_digest(signature, _signature(path, expires, nonce)):
+        return False
+
+    with _used_lock:
+        for used, used_expires in list(_used_nonces.items()):
+            if used_expires < now:
+                del _used_nonces[used]
+        if nonce in _used_nonces:
+            return False
+        _used_nonces[nonce] = expires
+    return True
+
+
+def _should_profile():
+    """Decide whether the current request should be profiled"""
+    if not PROFILE_ENABLED:
+        header = request.headers.get(PROFILE_HEADER, "")
+        if not header or not verify_signature(header, request.path):
+            return False
+    return random.random() < PROFILE_SAMPLE_RATE
+
+
+def _prune_profiles():
+    """Delete the oldest profile files beyond PROFILE_MAX_FILES"""
+    paths = [os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR)
+             if name.endswith(".folded")]
+    if len(paths) <= PROFILE_MAX_FILES:
+        return
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:len(paths) - PROFILE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class RequestProfile:
+    """Collects span timings and sampled stacks for a single request"""
+
+    def __init__(self, name):
+        self.name = name
+        self.thread_id = threading.get_ident()
+        self.stack = [name]
+        self.span_times = Counter()
+        self.stack_samples = Counter()
+        self._sampler = None
+        self._stop = threading.Event()
+
+    @contextmanager
+    def span(self, name):
+        """Time a named phase; nested spans produce nested stack frames"""
+        self.stack.append(name)
+        key = ";".join(self.stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Spans are recorded in microseconds so the folded output has integer weights
+            self.span_times[key] += int((time.perf_counter() - start) * 1_000_000)
+            self.stack.pop()
+
+    def start_sampling(self):
+        """Start a background thread that samples the handler's call stack"""
+        self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+        self._sampler.start()
+
+    def stop_sampling(self):
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+
+    def _sample_loop(self):
+        while not self._stop.wait(PROFILE_STACK_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stack_samples[";".join(reversed(frames))] += 1
+
+    def self_times(self):
+        """Convert inclusive span times to exclusive times, as flamegraphs expect"""
+        exclusive = Counter(self.span_times)
+        for key, value in self.span_times.items():
+            parent = key.rsplit(";", 1)[0]
+            if parent != key and parent in exclusive:
+                exclusive[parent] -= value
+        return {key: max(value, 0) for key, value in exclusive.items()}
+
+    def dump(self, total_us):
+        """Write span and stack files to PROFILE_DIR and return the span file path"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"{self.name}-{int(time.time() * 1000)}-{self.thread_id}")
+
+        self.span_times[self.name] = total_us
+        span_path = base + ".spans.folded"
+        with open(span_path, "w") as f:
+            for key, value in sorted(self.self_times().items()):
+                if value:
+                    f.write(f"{key} {value}\n")
+
+        if self.stack_samples:
+            with open(base + ".stacks.folded", "w") as f:
+                for key, count in sorted(self.stack_samples.items()):
+                    f.write(f"{key} {count}\n")
+
+        return span_path
+
+
+def span(name):
+    """Context manager recording a named phase of the current profiled request"""
+    profile = getattr(_local, "profile", None)
+    if profile is None:
+        return _NULL_SPAN
+    return profile.span(name)
+
+
+def profiled(handler):
+    """Wrap a Flask view so it can be profiled; a no-op when profiling is off"""
+    if not profiling_available():
+        return handler
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        if not _should_profile():
+            return handler(*args, **kwargs)
+
+        profile = RequestProfile(handler.__name__)
+        _local.profile = profile
+        if PROFILE_STACKS:
+            profile.start_sampling()
+        start = time.perf_counter()
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            total_us = int((time.perf_counter() - start) * 1_000_000)
+            profile.stop_sampling()
+            _local.profile = None
+            try:
+                with _dump_lock:
+                    path = profile.dump(total_us)
+                    _prune_profiles()
+                print(f"Profile written to {path}")
+            except OSError as e:
+                print(f"Error writing profile: {e}")
+
+    return wrapper
@@ -0,0 +1,117 @@
+"""
+Cache of AI suggestions keyed by a canonical ingredient set.
+
+"Rice, avocado" and "avocado and rice" map to the same key, so suggestions
+generated ahead of time by the expiry sweep are reused when the user asks.
+Entries live in the inventory SQLite database, so every worker process - and
+a sweep running in its own process - shares one cache. The cache is an
+optimization only: database errors are logged and treated as a miss, so
+suggestions keep working when the database is unavailable or locked.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+
+from dotenv import load_dotenv
+
+import inventory
+
+load_dotenv()
+
+CACHE_TTL = float(os.getenv("TRANA_SUGGESTION_CACHE_TTL", str(24 * 60 * 60)))
+CACHE_MAX_ENTRIES = int(os.getenv("TRANA_SUGGESTION_CACHE_SIZE", "1000"))
+
+
+# Database paths whose cache table this process has already created
+_ready_paths = set()
+
+
+def _connect():
+    conn = inventory.get_connection()
+    if inventory.DB_PATH not in _ready_paths:
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS suggestion_cache (
+                    key TEXT PRIMARY KEY,
+                    suggestions TEXT NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            """)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        _ready_paths.add(inventory.DB_PATH)
+    return conn
+
+
+def canonical_ingredients(ingredients):
+    """Return a sorted, de-duplicated, lowercase tuple of ingredient names
+
+    Accepts free text or a list of item names; both are split the same way so
+    stored item names and typed queries produce matching keys.
+    """
+    if isinstance(ingredients, str):
+        ingredients = [ingredients]
+    names = set()
+    for text in ingredients:
+        for name in re.split(r",|;|\n|\band\b", str(text).lower()):
+            name = " ".join(name.split())
+            if name:
+                names.add(name)
+    return tuple(sorted(names))
+
+
+def _key_text(key):
+    return json.dumps(list(key))
+
+
+def get(key):
+    """Return cached suggestions for a canonical key, or None on a miss or database error"""
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT suggestions, stored_at FROM suggestion_cache WHERE key = ?",
+                (_key_text(key),)
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Error reading suggestion cache: {e}")
+        return None
+
+    if row is None or time.time() - row[1] > CACHE_TTL:
+        return None
+    return json.loads(row[0])
+
+
+def contains(key):
+    """Check whether fresh suggestions are cached for a key"""
+    return get(key) is not None
+
+
+def put(key, suggestions):
+    """Store suggestions, evicting the oldest entries when the cache is full
+
+    A database error skips the store; the suggestions are simply not cached.
+    """
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO suggestion_cache (key, suggestions, stored_at) VALUES (?, ?, ?)",
+                    (_key_text(key), json.dumps(suggestions, ensure_ascii=False), time.time())
+                )
+                conn.execute(
+                    "DELETE FROM suggestion_cache WHERE key NOT IN "
+                    "(SELECT key FROM suggestion_cache ORDER BY stored_at DESC LIMIT ?)",
+                    (CACHE_MAX_ENTRIES,)
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Error writing suggestion cache: {e}")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the expiry sweep and the shared suggestion cache.
+Runs against a temporary SQLite database with a stand-in generator, without network.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+import app as backend
+import inventory
+import expiry_sweep
+import suggestion_cache
+
+
+@pytest.fixture(autouse=True)
+def temp_db(tmp_path, monkeypatch):
+    """Point the inventory store and cache at a fresh database for each test"""
+    monkeypatch.setattr(inventory, "DB_PATH", str(tmp_path / "trana.db"))
+
+
+def in_days(days):
+    return (date.today() + timedelta(days=days)).isoformat()
+
+
+def add_items(household, items):
+    rows = [{"name": name, "expiryDate": in_days(days)} for name, days in items]
+    inventory.import_items(household, enumerate(rows, start=1))
+
+
+def test_typed_query_matches_item_names():
+    from_items = suggestion_cache.canonical_ingredients(["Mac and Cheese", "Bread"])
+    assert suggestion_cache.canonical_ingredients("bread, mac and  cheese") == from_items
+    assert suggestion_cache.canonical_ingredients("Mac and Cheese; Bread") == from_items
+
+
+def test_expiring_sets_ordered_by_most_urgent_household():
+    add_items("h1", [("Milk", 2), ("Rice", 1), ("Old", -1), ("Far", 10)])
+    add_items("h2", [("Egg", 0)])
+    sets = expiry_sweep.expiring_sets(3)
+    assert [(household, names) for household, _, names in sets] == [("h2", ["Egg"]), ("h1", ["Rice", "Milk"])]
+
+
+def test_sweep_fills_cache_for_typed_query_within_budget():
+    add_items("h1", [("Mac and Cheese", 1), ("Bread", 2)])
+    add_items("h2", [("Egg", 1)])
+    prompts = []
+
+    def generate(ingredients):
+        prompts.append(ingredients)
+        return [{"title": "Idea", "description": ingredients}]
+
+    assert expiry_sweep.run_sweep(generate, budget=1, min_gap=0) == 1
+    assert expiry_sweep.run_sweep(generate, budget=5, min_gap=0) == 1
+    assert expiry_sweep.run_sweep(generate, budget=5, min_gap=0) == 0
+    assert "Mac and Cheese" in " ".join(prompts)
+
+    key = suggestion_cache.canonical_ingredients("Mac and Cheese, bread")
+    assert suggestion_cache.get(key) is not None
+
+
+def test_cache_errors_are_misses(tmp_path, monkeypatch):
+    monkeypatch.setattr(inventory, "DB_PATH", str(tmp_path / "missing" / "trana.db"))
+    key = suggestion_cache.canonical_ingredients("rice")
+    suggestion_cache.put(key, [{"title": "Idea", "description": "rice"}])
+    assert suggestion_cache.get(key) is None
+
+
+@pytest.mark.parametrize("days", ["-1", "soon", "366", "99999999999"])
+def test_household_suggestions_reject_bad_days(days):
+    response = backend.app.test_client().get(f"/api/households/h1/suggestions?days={days}")
+    assert response.status_code == 400
@@ -2,12 +2,14 @@
 """
 Test script for verifying the Gemini API connection and functionality.
 This script tests the Gemini API directly, without going through the Flask app.
+Set TRANA_CASSETTE_MODE=record or replay to capture or reuse the model traffic.
 """
 
 import os
 import json
 from dotenv import load_dotenv
 import google.generativeai as genai
+from cassette import cassette_mode, use_cassette
 
 def test_gemini_api():
     """Test basic functionality of the Gemini API with a simple prompt."""
@@ -17,7 +19,7 @@ def test_gemini_api():
     load_dotenv()
     api_key = os.getenv("GEMINI_API_KEY")
     
-    if not api_key:
+    if not api_key and cassette_mode() != "replay":
         print("ERROR: GEMINI_API_KEY environment variable not set")
         print("Please check your .env file")
         return False
@@ -27,7 +29,7 @@ def test_gemini_api():
     
     try:
         # Initialize the model (Gemini 1.5 Flash)
-        model = genai.GenerativeModel(
+        model = use_cassette(genai.GenerativeModel(
             model_name="gemini-1.5-flash",
             generation_config={
                 "temperature": 0.7,
@@ -35,7 +37,7 @@ def test_gemini_api():
                 "top_k": 40,
                 "top_p": 0.95,
             }
-        )
+        ))
         
         # Test with a simple prompt
         response = model.generate_content("Hello, can you provide a brief response to test the connection?")
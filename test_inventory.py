@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Tests for the inventory store used by the bulk import/export endpoints.
+Runs against a temporary SQLite database, without the Flask app or network.
+"""
+
+import io
+import csv
+import json
+
+import pytest
+
+import inventory
+
+
+@pytest.fixture(autouse=True)
+def temp_db(tmp_path, monkeypatch):
+    """Point the inventory store at a fresh database for each test"""
+    monkeypatch.setattr(inventory, "DB_PATH", str(tmp_path / "trana.db"))
+
+
+def text_stream(data):
+    """Decode bytes the way the import endpoint decodes the request body"""
+    return inventory.DecodedLines(io.BytesIO(data))
+
+
+class BrokenStream:
+    """Binary line stream that fails after yielding some lines, like a dropped upload"""
+
+    def __init__(self, lines):
+        self.lines = iter(lines)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self.lines, None)
+        if line is None:
+            raise OSError("connection reset")
+        return line
+
+
+def test_validate_item_defaults_and_normalization():
+    item = inventory.validate_item({"name": " Milk ", "expiryDate": "2030-01-05", "quantity": "2"})
+    assert item["name"] == "Milk"
+    assert item["quantity"] == 2 and isinstance(item["quantity"], int)
+    assert item["category"] == "other"
+    assert item["usedTimestamp"] is None
+    assert len(item["id"]) == 32
+
+
+@pytest.mark.parametrize("row, message", [
+    ({"expiryDate": "2030-01-05"}, "name is required"),
+    ({"name": "Milk"}, "expiryDate is required"),
+    ({"name": "Milk", "expiryDate": "05/01/2030"}, "expiryDate must be a date"),
+    ({"name": "Milk", "expiryDate": "2030-01-05", "quantity": "lots"}, "quantity must be a number"),
+    ({"name": "Milk", "expiryDate": "2030-01-05", "quantity": "-1"}, "quantity cannot be negative"),
+    ({"name": "Milk", "expiryDate": "2030-01-05", "quantity": "nan"}, "quantity must be a finite number"),
+    ({"name": "Milk", "expiryDate": "2030-01-05", "quantity": "inf"}, "quantity must be a finite number"),
+    (["Milk", "2030-01-05"], "Row must be an object"),
+])
+def test_validate_item_rejects_bad_rows(row, message):
+    with pytest.raises(inventory.ItemValidationError, match=message):
+        inventory.validate_item(row)
+
+
+def test_validate_item_ignores_extra_columns():
+    item = inventory.validate_item({"name": "Milk", "expiryDate": "2030-01-05", "brand": "Acme", "household": "other"})
+    assert "brand" not in item and "household" not in item
+    assert set(item) == set(inventory.ITEM_FIELDS)
+
+
+def test_validate_item_used_log_sets_timestamp():
+    item = inventory.validate_item({"name": "Kale", "expiryDate": "2030-01-05"}, log="used")
+    assert item["usedTimestamp"]
+
+
+def test_csv_rows_strip_bom_and_report_line_numbers():
+    data = "﻿name,expiryDate,extra\nMilk,2030-01-05,x\nRice,2030-01-06,y\n".encode("utf-8")
+    rows = list(inventory.iter_csv_rows(text_stream(data)))
+    assert [line for line, _ in rows] == [2, 3]
+    assert rows[0][1]["name"] == "Milk"
+
+
+def test_csv_oversized_field_is_a_row_error(monkeypatch):
+    limit = csv.field_size_limit()
+    csv.field_size_limit(50)
+    try:
+        data = "name,expiryDate\nMilk,2030-01-05\n" + "x" * 100 + ",2030-01-05\nRice,2030-01-06\n"
+        summary = inventory.import_items("h1", inventory.iter_csv_rows(io.StringIO(data)))
+    finally:
+        csv.field_size_limit(limit)
+    assert summary["imported"] == 2
+    assert summary["errors"][0]["line"] == 3
+    assert "Invalid CSV" in summary["errors"][0]["error"]
+
+
+def test_ndjson_rows_report_invalid_json():
+    data = '{"name": "Milk", "expiryDate": "2030-01-05"}\n\nnot json\n'
+    summary = inventory.import_items("h1", inventory.iter_ndjson_rows(io.StringIO(data)))
+    assert summary["imported"] == 1
+    assert summary["errors"] == [{"line": 3, "error": "Invalid JSON: Expecting value"}]
+
+
+def test_import_commits_in_chunks(monkeypatch):
+    monkeypatch.setattr(inventory, "IMPORT_CHUNK_SIZE", 2)
+    rows = enumerate([{"name": f"Item {i}", "expiryDate": "2030-01-05"} for i in range(5)], start=1)
+    summary = inventory.import_items("h1", rows)
+    assert summary == {"imported": 5, "errorCount": 0, "errors": []}
+    assert len(list(inventory.iter_items("h1"))) == 5
+
+
+def test_import_caps_reported_errors():
+    bad = inventory.MAX_REPORTED_ERRORS + 5
+    rows = enumerate([{"expiryDate": "2030-01-05"}] * bad, start=1)
+    summary = inventory.import_items("h1", rows)
+    assert summary["errorCount"] == bad
+    assert len(summary["errors"]) == inventory.MAX_REPORTED_ERRORS
+
+
+def test_invalid_utf8_is_a_row_error():
+    good = "".join(json.dumps({"name": f"Item {i}", "expiryDate": "2030-01-05"}) + "\n" for i in range(25))
+    data = good.encode("utf-8") + b"\xff\xfe broken\n" + good.encode("utf-8")
+    summary = inventory.import_items("h1", inventory.iter_ndjson_rows(text_stream(data)))
+    assert summary["imported"] == 50
+    assert summary["errors"] == [{"line": 26, "error": "Invalid UTF-8 at byte 0"}]
+
+
+def test_invalid_utf8_in_csv_is_a_row_error():
+    data = b"name,expiryDate\nMilk,2030-01-05\nCaf\xe9,2030-01-05\nRice,2030-01-06\n"
+    summary = inventory.import_items("h1", inventory.iter_csv_rows(text_stream(data)))
+    assert summary["imported"] == 2
+    assert summary["errors"] == [{"line": 3, "error": "Invalid UTF-8 at byte 3"}]
+
+
+def test_rows_after_invalid_utf8_in_csv_keep_their_line_numbers():
+    data = (
+        b"name,expiryDate,quantity\n"
+        b'"Milk\nsemi-skimmed",2030-01-05,1\n'
+        b"Bad\xff,2030-01-05,1\n"
+        b"Rice,05/01/2030,1\n"
+        b"Kale,2030-01-05,nan\n"
+        b"Egg,2030-01-05,6\n"
+    )
+    rows = list(inventory.iter_csv_rows(text_stream(data)))
+    assert [line for line, _ in rows] == [3, 4, 5, 6, 7]
+
+    summary = inventory.import_items("h1", iter(rows))
+    assert summary["imported"] == 2
+    assert [error["line"] for error in summary["errors"]] == [4, 5, 6]
+
+
+def test_stream_failure_keeps_committed_rows(monkeypatch):
+    monkeypatch.setattr(inventory, "IMPORT_CHUNK_SIZE", 10)
+    lines = [(json.dumps({"name": f"Item {i}", "expiryDate": "2030-01-05"}) + "\n").encode() for i in range(25)]
+    summary = inventory.import_items("h1", inventory.iter_ndjson_rows(inventory.DecodedLines(BrokenStream(lines))))
+    assert summary["imported"] == 25
+    assert summary["failed"]["reason"] == "input"
+    assert summary["failed"]["line"] == 26
+    assert len(list(inventory.iter_items("h1"))) == 25
+
+
+def test_households_and_logs_are_separate():
+    inventory.import_items("h1", enumerate([{"name": "Milk", "expiryDate": "2030-01-05"}]))
+    inventory.import_items("h1", enumerate([{"name": "Kale", "expiryDate": "2030-01-05"}]), log="used")
+    inventory.import_items("h2", enumerate([{"name": "Rice", "expiryDate": "2030-01-05"}]))
+    assert [item["name"] for item in inventory.iter_items("h1")] == ["Milk"]
+    assert [item["name"] for item in inventory.iter_items("h1", "used")] == ["Kale"]
+    assert [item["name"] for item in inventory.iter_items("h2")] == ["Rice"]
+
+
+def test_csv_export_round_trip():
+    rows = [
+        {"name": "Milk", "category": "dairy", "quantity": "2", "unit": "l", "expiryDate": "2030-01-06", "notes": "semi, skimmed"},
+        {"name": "Rice", "category": "grain", "quantity": "1.5", "unit": "kg", "expiryDate": "2030-01-05"},
+    ]
+    inventory.import_items("h1", enumerate(rows, start=1))
+    exported = "".join(inventory.export_csv(inventory.iter_items("h1")))
+
+    summary = inventory.import_items("h2", inventory.iter_csv_rows(io.StringIO(exported)))
+    assert summary["imported"] == 2 and summary["errorCount"] == 0
+    assert "".join(inventory.export_csv(inventory.iter_items("h2"))) == exported
+    assert [item["quantity"] for item in inventory.iter_items("h2")] == [1.5, 2]
+
+
+def test_ndjson_export_round_trip():
+    inventory.import_items("h1", enumerate([{"name": "Egg", "quantity": 6, "expiryDate": "2030-01-05"}]))
+    exported = "".join(inventory.export_ndjson(inventory.iter_items("h1")))
+    assert json.loads(exported)["quantity"] == 6
+
+    inventory.import_items("h2", inventory.iter_ndjson_rows(io.StringIO(exported)))
+    assert "".join(inventory.export_ndjson(inventory.iter_items("h2"))) == exported
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the lazily initialized model client.
+Uses the replay cassette in tests/cassettes/pipeline.ndjson, without an API key or network.
+"""
+
+import os
+
+import pytest
+
+from cassette import load_cassette
+from model_client import ModelClient
+
+CASSETTE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "cassettes", "pipeline.ndjson")
+PROMPT = load_cassette(CASSETTE_PATH)[0]["prompt"]
+
+
+@pytest.fixture
+def replay(monkeypatch):
+    """Serve the model from the tracked cassette"""
+    monkeypatch.setenv("TRANA_CASSETTE_MODE", "replay")
+    monkeypatch.setenv("TRANA_CASSETTE_PATH", CASSETTE_PATH)
+    monkeypatch.setenv("TRANA_CASSETTE_LATENCY_SCALE", "0")
+
+
+def new_client():
+    return ModelClient(model_name="gemini-1.5-flash", generation_config={})
+
+
+def test_missing_key_is_reported_on_first_use(monkeypatch):
+    monkeypatch.delenv("TRANA_CASSETTE_MODE", raising=False)
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    client = new_client()
+    assert client.get_stats()["initialized"] is False
+
+    with pytest.raises(ValueError, match="GEMINI_API_KEY"):
+        client.generate_content(PROMPT)
+    stats = client.get_stats()
+    assert "GEMINI_API_KEY" in stats["last_error"]
+    assert stats["initializations"] == 0 and stats["requests"] == 0
+    assert stats["initialized"] is False
+
+
+def test_upstream_errors_are_recorded(replay):
+    client = new_client()
+    with pytest.raises(Exception, match="No recorded response"):
+        client.generate_content("not in the cassette")
+    assert "No recorded response" in client.get_stats()["last_error"]
+
+
+def test_requests_reuse_one_connection(replay):
+    client = new_client()
+    first = client.generate_content(PROMPT)
+    second = client.generate_content(PROMPT)
+    assert first.text == second.text
+
+    stats = client.get_stats()
+    assert stats["initializations"] == 1
+    assert stats["connections_opened"] == 1
+    assert stats["requests"] == 2
+    assert stats["requests_on_reused_connection"] == 1
+    assert stats["connection_reuse_ratio"] == 0.5
+    assert stats["first_request_seconds"] is not None
+
+
+def test_new_pid_rebuilds_model_and_resets_stats(replay, monkeypatch):
+    client = new_client()
+    client.generate_content(PROMPT)
+    parent_model = client.get_model()
+
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    assert client.get_stats()["initialized"] is False
+    client.generate_content(PROMPT)
+    assert client.get_model() is not parent_model
+
+    stats = client.get_stats()
+    assert stats["pid"] == -1
+    assert stats["initializations"] == 1 and stats["requests"] == 1
+    assert stats["connections_opened"] == 1 and stats["requests_on_reused_connection"] == 0
+
+
+def test_background_warmup_starts_once_per_process(replay, monkeypatch):
+    client = new_client()
+    client.start_background_warmup()
+    thread = client._warmup_thread
+    client.start_background_warmup()
+    assert client._warmup_thread is thread
+    thread.join()
+    assert client.get_stats()["warmups"] == 1
+
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    client.start_background_warmup()
+    assert client._warmup_thread is not thread
+    client._warmup_thread.join()
+    assert client.get_stats()["warmups"] == 1
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for request profiling: signed header checks, exclusive span times and
+profile file pruning. Runs without the Flask app or network.
+"""
+
+import os
+import time
+
+import pytest
+
+import profiling
+
+
+@pytest.fixture(autouse=True)
+def profile_secret(monkeypatch):
+    """Sign headers with a known secret and start each test with no used nonces"""
+    monkeypatch.setattr(profiling, "PROFILE_SECRET", "test-secret")
+    monkeypatch.setattr(profiling, "PROFILE_MAX_TTL", 300)
+    monkeypatch.setattr(profiling, "_used_nonces", {})
+
+
+def test_signed_header_is_accepted_once():
+    header = profiling.sign_path("/api/learn")
+    assert profiling.verify_signature(header, "/api/learn")
+    assert not profiling.verify_signature(header, "/api/learn")
+
+
+def test_signed_header_is_bound_to_its_path():
+    header = profiling.sign_path("/api/learn")
+    assert not profiling.verify_signature(header, "/api/suggestions")
+
+
+def test_expired_header_is_rejected():
+    assert not profiling.verify_signature(profiling.sign_path("/api/learn", ttl=-1), "/api/learn")
+
+
+def test_header_beyond_max_ttl_is_rejected():
+    assert not profiling.verify_signature(profiling.sign_path("/api/learn", ttl=301), "/api/learn")
+
+
+def test_header_signed_with_another_secret_is_rejected(monkeypatch):
+    header = profiling.sign_path("/api/learn")
+    monkeypatch.setattr(profiling, "PROFILE_SECRET", "other-secret")
+    assert not profiling.verify_signature(header, "/api/learn")
+
+
+@pytest.mark.parametrize("header", ["", "garbage", "soon:nonce:sig", "1:2:3:4"])
+def test_malformed_header_is_rejected(header):
+    assert not profiling.verify_signature(header, "/api/learn")
+
+
+def test_expired_nonces_are_forgotten(monkeypatch):
+    monkeypatch.setattr(profiling, "_used_nonces", {"old": int(time.time()) - 10})
+    assert profiling.verify_signature(profiling.sign_path("/api/learn"), "/api/learn")
+    assert "old" not in profiling._used_nonces
+
+
+def test_self_times_subtract_child_spans():
+    profile = profiling.RequestProfile("learn")
+    profile.span_times.update({
+        "learn": 1000,
+        "learn;generate_content": 600,
+        "learn;parse_response": 300,
+        "learn;parse_response;repair_json": 120,
+    })
+    assert profile.self_times() == {
+        "learn": 100,
+        "learn;generate_content": 600,
+        "learn;parse_response": 180,
+        "learn;parse_response;repair_json": 120,
+    }
+
+
+def test_self_times_never_negative():
+    profile = profiling.RequestProfile("learn")
+    profile.span_times.update({"learn": 10, "learn;jsonify": 15})
+    assert profile.self_times()["learn"] == 0
+
+
+def test_prune_keeps_newest_profiles(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE_MAX_FILES", 2)
+    for age, name in enumerate(["c.spans.folded", "b.spans.folded", "a.spans.folded"]):
+        path = tmp_path / name
+        path.write_text("learn 1\n")
+        os.utime(path, (1000 - age, 1000 - age))
+    (tmp_path / "notes.txt").write_text("kept")
+
+    profiling._prune_profiles()
+    assert sorted(os.listdir(tmp_path)) == ["b.spans.folded", "c.spans.folded", "notes.txt"]
+
+
+def test_invalid_numeric_setting_falls_back_to_default(monkeypatch):
+    monkeypatch.setenv("TRANA_PROFILE_MAX_TTL", "five minutes")
+    assert profiling._env_number("TRANA_PROFILE_MAX_TTL", 300, int) == 300
+    monkeypatch.setenv("TRANA_PROFILE_MAX_TTL", "60")
+    assert profiling._env_number("TRANA_PROFILE_MAX_TTL", 300, int) == 60
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Deterministic regression test for the Flask backend pipeline.
+
+Runs a fixed set of ingredients and topics through /api/suggestions and
+/api/learn in-process, with the Gemini model served from the cassette in
+tests/cassettes/pipeline.ndjson. No API key or network is needed:
+
+    python test_replay_pipeline.py
+
+Each response is checked against the content parsed from the cassette, and
+the median request time must stay under TRANA_REPLAY_MAX_MEDIAN_MS
+(default 50 ms). Replay latency is zero, so the budget covers only the
+backend's own parsing, repair and validation work.
+
+To refresh the cassette from the live model, delete it and record it again
+with a key configured (content and timing checks are skipped while recording):
+
+    TRANA_CASSETTE_MODE=record python test_replay_pipeline.py
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+import app as backend
+import inventory
+from cassette import cassette_mode, use_cassette
+
+CASSETTE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "cassettes", "pipeline.ndjson")
+MAX_MEDIAN_MS = float(os.getenv("TRANA_REPLAY_MAX_MEDIAN_MS", "50"))
+
+# Suggestion titles parsed from each recorded response: a plain JSON array,
+# a fenced JSON array and plain text
+TEST_INGREDIENTS = {
+    "leftover rice, half an avocado, and some bell peppers": ["Stuffed Bell Peppers", "Avocado Fried Rice", "Rice and Pepper Salad"],
+    "stale bread, eggs, milk": ["Savory Bread Pudding", "French Toast", "Homemade Croutons"],
+    "overripe bananas and oats": ["Banana Oat Cookies", "Banana Overnight Oats", "Banana Oat Pancakes"],
+}
+
+# Title and tips parsed from each recorded response: plain JSON, fenced JSON,
+# and JSON with a missing closing bracket that only parses after repair
+TEST_TOPICS = {
+    "composting": ("Composting at Home", ["Balance greens and browns", "Keep the pile moist but not wet", "Turn it every week or two"]),
+    "food storage": ("Storing Food to Make It Last", ["Keep your fridge at 4°C or below", "Store onions and potatoes apart", "Freeze leftovers in labelled portions"]),
+    "meal planning": ("Meal Planning to Reduce Waste", ["Check what you have before shopping", "Plan a leftovers night", "Buy loose produce in the amounts you need"]),
+}
+
+REPLAYING = cassette_mode() != "record"
+
+def print_color(text, color_code):
+    """Print colored text to the console"""
+    print(f"\033[{color_code}m{text}\033[0m")
+
+def print_success(text):
+    """Print success message in green"""
+    print_color(text, 92)
+
+def print_info(text):
+    """Print info message in blue"""
+    print_color(text, 94)
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client using the cassette model and a fresh database
+
+    A fresh database keeps the shared suggestion cache from answering instead of the pipeline.
+    """
+    monkeypatch.setattr(inventory, "DB_PATH", str(tmp_path / "trana.db"))
+    if REPLAYING:
+        monkeypatch.setattr(backend, "model", use_cassette(None, mode="replay", path=CASSETTE_PATH, latency_scale=0))
+    else:
+        # The lazy live client reads the cassette settings when it first builds the model
+        monkeypatch.setenv("TRANA_CASSETTE_PATH", CASSETTE_PATH)
+    return backend.app.test_client()
+
+def run_requests(client, endpoint, field, values):
+    """Post each value to an endpoint and return ({value: response data}, timings in ms)"""
+    responses = {}
+    timings = []
+    for value in values:
+        start = time.perf_counter()
+        response = client.post(endpoint, json={field: value})
+        timings.append((time.perf_counter() - start) * 1000)
+
+        data = response.get_json()
+        assert response.status_code == 200 and data.get("status") == "success", f"{value}: {data.get('message')}"
+        responses[value] = data
+    return responses, timings
+
+def check_timings(name, timings):
+    """Print a timing summary and, when replaying, enforce the median budget"""
+    timings = sorted(timings)
+    median = timings[len(timings) // 2]
+    print_info(f"\n===== {name} =====")
+    print_info(f"Requests: {len(timings)}, median: {median:.2f} ms, max: {timings[-1]:.2f} ms")
+    if REPLAYING:
+        assert median <= MAX_MEDIAN_MS, f"{name} median {median:.2f} ms exceeds {MAX_MEDIAN_MS} ms"
+    print_success("✅ All responses valid")
+
+def test_suggestions_replay(client):
+    """Replay suggestion requests through JSON and plain-text parsing"""
+    responses, timings = run_requests(client, "/api/suggestions", "ingredients", TEST_INGREDIENTS)
+    if REPLAYING:
+        for ingredients, titles in TEST_INGREDIENTS.items():
+            suggestions = responses[ingredients]["suggestions"]
+            assert [suggestion["title"] for suggestion in suggestions] == titles
+            assert all(suggestion["description"] for suggestion in suggestions)
+    check_timings("/api/suggestions", timings)
+
+def test_learn_replay(client):
+    """Replay learn requests through parsing, JSON repair and validation"""
+    responses, timings = run_requests(client, "/api/learn", "topic", TEST_TOPICS)
+    if REPLAYING:
+        for topic, (title, tips) in TEST_TOPICS.items():
+            content = responses[topic]["content"]
+            assert content["title"] == title
+            assert content["tips"] == tips
+    check_timings("/api/learn", timings)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q", "-s"]))